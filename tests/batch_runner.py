@@ -0,0 +1,138 @@
+# coding=utf-8
+# Copyright 2022 HuggingFace Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+Persistent worker that runs several configurations of an example script in a single Python process.
+
+Usage:
+    python3 batch_runner.py path/to/run_example.py
+
+Each line read on stdin is a shell-escaped list of arguments for the example script.
+Once a run is over, its exit code is written as a line on stdout. Everything printed by the
+example itself is redirected to stderr so that it does not interfere with this protocol.
+
+Tests start and talk to the workers with `run_in_worker` and stop them with `stop_workers`.
+A worker holds an HPU for as long as it lives, so workers must be stopped before launching any
+other run that needs the devices.
+"""
+
+import os
+import runpy
+import shlex
+import subprocess
+import sys
+import traceback
+from pathlib import Path
+from typing import Dict, List, Optional, Union
+
+
+BATCH_RUNNER = Path(__file__).resolve()
+# Seconds to wait for a worker to exit once its stdin is closed before killing it
+WORKER_EXIT_TIMEOUT = 60
+# Mapping between example scripts and their running worker
+_WORKERS: Dict[str, subprocess.Popen] = {}
+
+
+def run_in_worker(script: Union[str, os.PathLike], args: List[str]) -> int:
+    """
+    Run the example script with the given arguments in the worker of this script and return the exit code.
+    The worker is started the first time the script is run, or if the previous worker died.
+    """
+    script = str(script)
+    worker = _WORKERS.get(script)
+    if worker is None or worker.poll() is not None:
+        worker = subprocess.Popen(
+            ["python3", str(BATCH_RUNNER), script],
+            stdin=subprocess.PIPE,
+            stdout=subprocess.PIPE,
+            text=True,
+        )
+        _WORKERS[script] = worker
+
+    try:
+        worker.stdin.write(shlex.join(args) + "\n")
+        worker.stdin.flush()
+        return_code = worker.stdout.readline()
+    except BrokenPipeError:
+        # The worker died before reading the arguments
+        return_code = ""
+
+    if not return_code:
+        # The worker crashed, drop it so that a new one is started at the next run
+        stop_workers(script)
+        return 1
+    return int(return_code)
+
+
+def stop_workers(script: Optional[Union[str, os.PathLike]] = None, timeout: float = WORKER_EXIT_TIMEOUT):
+    """
+    Stop the worker of the given script, or all the workers if no script is given, so that they release their device.
+    A worker that does not exit within `timeout` seconds, e.g. because it is in the middle of a run, is killed.
+    """
+    scripts = list(_WORKERS) if script is None else [str(script)]
+    for script in scripts:
+        worker = _WORKERS.pop(script, None)
+        if worker is None:
+            continue
+        try:
+            worker.stdin.close()
+        except BrokenPipeError:
+            pass
+        try:
+            worker.wait(timeout=timeout)
+        except subprocess.TimeoutExpired:
+            worker.kill()
+            worker.wait()
+        worker.stdout.close()
+
+
+def run_main(script: str, args: List[str]) -> int:
+    """
+    Run the example script as `__main__` with the given arguments and return its exit code.
+    """
+    sys.argv = [script] + args
+    try:
+        runpy.run_path(script, run_name="__main__")
+    except SystemExit as e:
+        if e.code is None:
+            return 0
+        return e.code if isinstance(e.code, int) else 1
+    except Exception:
+        traceback.print_exc()
+        return 1
+
+    return 0
+
+
+def main():
+    script = os.path.abspath(sys.argv[1])
+    # Examples import their local modules (e.g. utils_qa), as when they are launched with `python3 run_example.py`
+    sys.path.insert(0, os.path.dirname(script))
+
+    protocol = os.fdopen(os.dup(sys.stdout.fileno()), "w")
+    sys.stdout.flush()
+    os.dup2(sys.stderr.fileno(), sys.stdout.fileno())
+
+    for line in sys.stdin:
+        if not line.strip():
+            continue
+        return_code = run_main(script, shlex.split(line))
+        sys.stdout.flush()
+        protocol.write(f"{return_code}\n")
+        protocol.flush()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,153 @@
+# coding=utf-8
+# Copyright 2022 HuggingFace Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import subprocess
+import sys
+import tempfile
+import unittest
+from pathlib import Path
+
+from .batch_runner import _WORKERS, BATCH_RUNNER, run_in_worker, stop_workers
+
+
+# Dummy example that prints on stdout like real examples do and exits depending on its first argument
+DUMMY_EXAMPLE = """
+import os
+import sys
+import time
+
+print("Running with", sys.argv[1:])
+
+if __name__ == "__main__":
+    if sys.argv[1] == "exit":
+        sys.exit(int(sys.argv[2]))
+    elif sys.argv[1] == "raise":
+        raise RuntimeError("Example failed")
+    elif sys.argv[1] == "check_args" and sys.argv[2:] != ["--source_prefix", '"summarize: "']:
+        sys.exit(2)
+    elif sys.argv[1] == "crash":
+        os._exit(5)
+    elif sys.argv[1] == "sleep":
+        time.sleep(600)
+"""
+
+
+class BatchRunnerTester(unittest.TestCase):
+    """
+    Unit tests for the batch worker used by example tests, its stdin/stdout protocol and its lifecycle.
+    """
+
+    def test_exit_codes(self):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            script = Path(tmp_dir) / "run_dummy.py"
+            script.write_text(DUMMY_EXAMPLE)
+
+            stdin = "\n".join(
+                [
+                    "ok",
+                    "exit 3",
+                    "raise",
+                    "exit 0",
+                    "",
+                    "check_args --source_prefix '\"summarize: \"'",
+                ]
+            )
+            proc = subprocess.run(
+                [sys.executable, str(BATCH_RUNNER), str(script)],
+                input=stdin + "\n",
+                capture_output=True,
+                text=True,
+                timeout=60,
+            )
+
+        self.assertEqual(proc.returncode, 0, proc.stderr)
+        # Empty lines are ignored and what the example prints must not end up in the protocol
+        self.assertEqual(proc.stdout.splitlines(), ["0", "3", "1", "0", "0"])
+        self.assertIn("Running with", proc.stderr)
+        self.assertIn("RuntimeError: Example failed", proc.stderr)
+
+    def test_run_in_worker(self):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            script = Path(tmp_dir) / "run_dummy.py"
+            script.write_text(DUMMY_EXAMPLE)
+            self.addCleanup(stop_workers)
+
+            self.assertEqual(run_in_worker(script, ["ok"]), 0)
+            worker = _WORKERS[str(script)]
+            self.assertEqual(run_in_worker(script, ["exit", "3"]), 3)
+            self.assertEqual(run_in_worker(script, ["raise"]), 1)
+            self.assertEqual(run_in_worker(script, ["check_args", "--source_prefix", '"summarize: "']), 0)
+            # All the runs of a script go to the same worker
+            self.assertIs(_WORKERS[str(script)], worker)
+
+            # A worker that dies reports a failure and is replaced at the next run
+            self.assertEqual(run_in_worker(script, ["crash"]), 1)
+            self.assertEqual(run_in_worker(script, ["ok"]), 0)
+            self.assertIsNot(_WORKERS[str(script)], worker)
+
+            stop_workers(script)
+            self.assertNotIn(str(script), _WORKERS)
+
+    def test_stop_workers_kills_busy_worker(self):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            script = Path(tmp_dir) / "run_dummy.py"
+            script.write_text(DUMMY_EXAMPLE)
+            self.addCleanup(stop_workers)
+
+            self.assertEqual(run_in_worker(script, ["ok"]), 0)
+            worker = _WORKERS[str(script)]
+            # Start a run without waiting for it, as when a session is interrupted
+            worker.stdin.write("sleep\n")
+            worker.stdin.flush()
+
+            stop_workers(timeout=1)
+            self.assertIsNotNone(worker.poll())
+            self.assertEqual(_WORKERS, {})
+
+
+class BatchedRegressionTester(unittest.TestCase):
+    """
+    Unit tests for the metrics assessed on example runs executed in a batch worker.
+    """
+
+    BASELINE = {"eval_f1": 90.0, "train_runtime": 100.0, "train_samples_per_second": 10.0}
+
+    def setUp(self):
+        # Imported here so that the tests above do not depend on the libraries required by example tests
+        from .test_examples import ExampleTesterBase
+
+        self.tester = ExampleTesterBase()
+
+    def test_time_metrics_are_not_asserted(self):
+        results = {"eval_f1": 90.0, "train_runtime": 1000.0, "train_samples_per_second": 1.0}
+
+        self.tester.assert_no_regression(results, self.BASELINE, "bert-base-uncased", batched=True)
+        with self.assertRaises(AssertionError):
+            self.tester.assert_no_regression(results, self.BASELINE, "bert-base-uncased")
+
+    def test_accuracy_is_asserted(self):
+        results = {"eval_f1": 50.0, "train_runtime": 100.0, "train_samples_per_second": 10.0}
+
+        with self.assertRaises(AssertionError):
+            self.tester.assert_no_regression(results, self.BASELINE, "bert-base-uncased", batched=True)
+
+    def test_accuracy_metric_is_required(self):
+        results = {"train_runtime": 100.0, "train_samples_per_second": 10.0}
+        baseline = {"train_runtime": 100.0, "train_samples_per_second": 10.0}
+
+        with self.assertRaises(AssertionError):
+            self.tester.assert_no_regression(results, baseline, "bert-base-uncased", batched=True)
+        # There is no accuracy metric for BLOOM
+        self.tester.assert_no_regression(results, baseline, "bigscience/bloom-7b1", batched=True)
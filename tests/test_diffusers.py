@@ -16,7 +16,6 @@
 
 import json
 import os
-import re
 import subprocess
 import tempfile
 from io import BytesIO
@@ -49,6 +48,8 @@ from optimum.habana.diffusers import (
 )
 from optimum.habana.utils import set_seed
 
+from .utils import CMD_SPLIT_RE
+
 
 if os.environ.get("GAUDI2_CI", "0") == "1":
     THROUGHPUT_BASELINE_BF16 = 1.019
@@ -795,8 +796,7 @@ class GaudiStableDiffusionPipelineTester(TestCase):
                     "--throughput_warmup_steps 3",
                     "--seed 27",
                 ]
-                pattern = re.compile(r"([\"\'].+?[\"\'])|\s")
-                cmd_line = [x for y in cmd_line for x in re.split(pattern, y) if x]
+                cmd_line = [x for y in cmd_line for x in CMD_SPLIT_RE.split(y) if x]
 
                 # Run textual inversion
                 p = subprocess.Popen(cmd_line)
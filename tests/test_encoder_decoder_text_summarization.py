@@ -1,6 +1,5 @@
 import json
 import os
-import re
 import subprocess
 from pathlib import Path
 from tempfile import TemporaryDirectory
@@ -8,6 +7,7 @@ from tempfile import TemporaryDirectory
 import pytest
 
 from .test_examples import ACCURACY_PERF_FACTOR, TIME_PERF_FACTOR
+from .utils import CMD_SPLIT_RE
 
 
 if os.environ.get("GAUDI2_CI", "0") == "1":
@@ -85,8 +85,7 @@ def _test_text_summarization(
 
         # command.append(f"--token {token.value}")
 
-        pattern = re.compile(r"([\"\'].+?[\"\'])|\s")
-        command = [x for y in command for x in re.split(pattern, y) if x]
+        command = [x for y in command for x in CMD_SPLIT_RE.split(y) if x]
 
         proc = subprocess.run(command)
 
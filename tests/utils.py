@@ -13,6 +13,12 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
+import re
+
+
+# Splits "--flag value" strings on whitespace while keeping quoted values (quotes included) in a single token
+CMD_SPLIT_RE = re.compile(r"([\"\'].+?[\"\'])|\s")
+
 
 # Mapping between model families and specific model names with their configuration
 MODELS_TO_TEST_MAPPING = {